@@ -0,0 +1,93 @@
+"""
+Génère Data/regions_simplified.geojson à partir de Data/regions.geojson.
+
+Version allégée utilisée par la carte Streamlit :
+- simplification Douglas-Peucker de chaque anneau (tolérance en degrés) ;
+- coordonnées arrondies (4 décimales ≈ 11 m) ;
+- JSON compact (séparateurs sans espaces).
+
+À relancer après toute modification de regions.geojson (depuis la racine du projet) :
+    python 01_Notebooks/simplify_geojson.py
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+from pathlib import Path
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "Data"
+
+TOLERANCE = 0.002  # degrés (~200 m) : les polygones sources ont déjà ~3 km entre sommets
+DECIMALS = 4
+
+
+def douglas_peucker(points: list, eps: float) -> list:
+    """Simplifie une ligne (liste de [x, y]) en gardant les points à plus de eps du segment."""
+    if len(points) < 3:
+        return points
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        a, b = stack.pop()
+        (x1, y1), (x2, y2) = points[a][:2], points[b][:2]
+        dx, dy = x2 - x1, y2 - y1
+        length = math.hypot(dx, dy)
+
+        best, idx = 0.0, None
+        for i in range(a + 1, b):
+            x, y = points[i][:2]
+            if length == 0:
+                d = math.hypot(x - x1, y - y1)
+            else:
+                d = abs(dy * x - dx * y + x2 * y1 - y2 * x1) / length
+            if d > best:
+                best, idx = d, i
+
+        if idx is not None and best > eps:
+            keep[idx] = True
+            stack += [(a, idx), (idx, b)]
+
+    return [p for p, k in zip(points, keep) if k]
+
+
+def simplify_ring(ring: list, eps: float, decimals: int) -> list:
+    """Simplifie un anneau ; le garde intact s'il deviendrait dégénéré (< 4 points)."""
+    out = douglas_peucker(ring, eps)
+    if len(out) < 4:
+        out = ring
+    return [[round(x, decimals), round(y, decimals)] for x, y in (p[:2] for p in out)]
+
+
+def simplify_geojson(geojson: dict, eps: float = TOLERANCE, decimals: int = DECIMALS) -> dict:
+    """Simplifie en place les géométries Polygon / MultiPolygon du GeoJSON."""
+    for feat in geojson.get("features", []):
+        geom = feat.get("geometry") or {}
+        if geom.get("type") == "Polygon":
+            geom["coordinates"] = [simplify_ring(r, eps, decimals) for r in geom["coordinates"]]
+        elif geom.get("type") == "MultiPolygon":
+            geom["coordinates"] = [
+                [simplify_ring(r, eps, decimals) for r in poly] for poly in geom["coordinates"]
+            ]
+    return geojson
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", type=Path, default=DATA_DIR / "regions.geojson")
+    parser.add_argument("--output", type=Path, default=DATA_DIR / "regions_simplified.geojson")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--decimals", type=int, default=DECIMALS)
+    args = parser.parse_args()
+
+    geojson = json.loads(args.input.read_text(encoding="utf-8"))
+    simplify_geojson(geojson, args.tolerance, args.decimals)
+    text = json.dumps(geojson, ensure_ascii=False, separators=(",", ":"))
+    args.output.write_text(text + "\n", encoding="utf-8")
+    print(f"{args.input.name} -> {args.output.name} ({len(text) / 1024:.0f} Ko)")
+
+
+if __name__ == "__main__":
+    main()
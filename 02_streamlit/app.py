@@ -1,6 +1,40 @@
 import streamlit as st
 import pandas as pd
-from utils import load_data
+from utils import load_columns_profile, load_data
+
+
+# -----------------------------------------------------------------------------
+# DICTIONNAIRE DES VARIABLES (calculé une fois, mis en cache)
+# -----------------------------------------------------------------------------
+DESC_MAP = {
+    "CODGEO_2025": "Code INSEE de la commune",
+    "annee": "Année du recensement",
+    "nombre": "Nombre de faits enregistrés",
+    "taux_pour_mille": "Ratio pour 1 000 hab. (Variable créée)",
+    "variation_region": "Évolution annuelle (Variable créée)",
+    "niveau_delinquance": "Classement catégoriel (Faible, Moyen, Élevé)",
+    "taille_commune": "Tranche de population de la commune",
+    "categorie_indicateur": "Regroupement thématique des infractions",
+}
+
+
+@st.cache_data(show_spinner=False)
+def build_info_df() -> pd.DataFrame:
+    """
+    Dictionnaire des variables (type, complétude, signification), calculé une fois.
+    Couvre toutes les colonnes du fichier, pas seulement celles chargées par load_data().
+    """
+    profile = load_columns_profile()
+    missing_pct = (profile["n_manquants"] / len(load_data()) * 100).round(2)
+
+    return pd.DataFrame(
+        {
+            "Variable": profile["Variable"].values,
+            "Type": profile["Type"].values,
+            "Complétude": (100 - missing_pct).map("{:.1f}%".format).values,
+            "Signification": pd.Series(DESC_MAP).reindex(profile["Variable"], fill_value="Donnée analytique").values,
+        }
+    )
 
 
 # -----------------------------------------------------------------------------
@@ -14,9 +48,9 @@ st.set_page_config(
 
 # -----------------------------------------------------------------------------
 # STYLE CSS (lisibilité + métriques + tableaux)
+# Propre à la page d'accueil : les autres pages gardent le thème Streamlit
 # -----------------------------------------------------------------------------
-st.markdown(
-    """
+APP_CSS = """
 <style>
   /* Fond global */
   .stApp { background-color: #f6f9ff; }
@@ -61,9 +95,9 @@ st.markdown(
     box-shadow: 0 2px 8px rgba(0,0,0,0.05);
   }
 </style>
-""",
-    unsafe_allow_html=True,
-)
+"""
+
+st.markdown(APP_CSS, unsafe_allow_html=True)
 
 # -----------------------------------------------------------------------------
 # CHARGEMENT DES DONNÉES
@@ -148,7 +182,7 @@ Exploration détaillée via la <strong>catégorisation des indicateurs</strong>
         st.caption("Après nettoyage et filtrage")
 
     with col3:
-        st.metric("Variables Totales", df.shape[1])
+        st.metric("Variables Totales", len(load_columns_profile()))
         st.caption("Initialement : 13 colonnes")
 
     with col4:
@@ -161,28 +195,7 @@ Exploration détaillée via la <strong>catégorisation des indicateurs</strong>
     # DICTIONNAIRE + COMPLÉTUDE
     # -----------------------------------------------------------------------------
     with st.expander("🔍 Dictionnaire des variables et analyse de complétude"):
-        missing_counts = df.isnull().sum()
-        missing_pct = (missing_counts / len(df) * 100).round(2)
-
-        desc_map = {
-            "CODGEO_2025": "Code INSEE de la commune",
-            "annee": "Année du recensement",
-            "nombre": "Nombre de faits enregistrés",
-            "taux_pour_mille": "Ratio pour 1 000 hab. (Variable créée)",
-            "variation_region": "Évolution annuelle (Variable créée)",
-            "niveau_delinquance": "Classement catégoriel (Faible, Moyen, Élevé)",
-            "taille_commune": "Tranche de population de la commune",
-            "categorie_indicateur": "Regroupement thématique des infractions",
-        }
-
-        info_df = pd.DataFrame(
-            {
-                "Variable": df.columns,
-                "Type": df.dtypes.astype(str).values,
-                "Complétude": [f"{100 - p:.1f}%" for p in missing_pct.values],
-                "Signification": [desc_map.get(col, "Donnée analytique") for col in df.columns],
-            }
-        )
+        info_df = build_info_df()
 
         # On garde st.table (statique) mais avec CSS correct -> texte toujours visible
         st.table(info_df.head(15))
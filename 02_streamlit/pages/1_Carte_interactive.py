@@ -1,13 +1,13 @@
 import streamlit as st
 import plotly.express as px
 
-from utils import load_data, load_geojson, build_region_metrics, geojson_with_norm_names
+from utils import load_geojson, load_region_metrics, geojson_for_plot
 
 st.set_page_config(page_title="Carte France", layout="wide")
 st.title("🗺️ Carte interactive — Taux & variation (pour mille) par région")
 
-df = load_data()
-geojson = load_geojson()
+# geojson normalisé (properties['region_norm']) : seule la clé détectée sert ici
+_, geo_key = load_geojson()
 
 st.markdown(
     """
@@ -33,10 +33,7 @@ st.markdown(
 )
 
 # métriques région-année
-g = build_region_metrics(df)
-
-# geojson normalisé
-gj, geo_key = geojson_with_norm_names(geojson)
+g = load_region_metrics()
 
 # Sélecteur année
 years = sorted([int(y) for y in g["annee"].dropna().unique()])
@@ -49,12 +46,12 @@ metric = st.radio(
     horizontal=True
 )
 
-g_y = g[g["annee"] == year].copy()
+g_y = g[g["annee"] == year]
 
 # Choroplèthe : on match via region_norm dans geojson et nom_region_norm dans data
 fig = px.choropleth(
     g_y,
-    geojson=gj,
+    geojson=geojson_for_plot(),
     locations="nom_region_norm",
     featureidkey="properties.region_norm",
     color=metric,
@@ -73,7 +70,7 @@ fig = px.choropleth(
 )
 
 fig.update_geos(fitbounds="locations", visible=False)
-fig.update_layout(margin={"r":0,"t":0,"l":0,"b":0})
+fig.update_layout(margin={"r":0,"t":0,"l":0,"b":0}, uirevision="keep")
 
 c1, c2 = st.columns([2, 1], vertical_alignment="top")
 
@@ -82,10 +79,12 @@ with c1:
 
 with c2:
     st.subheader("📌 Tableau (année sélectionnée)")
-    st.dataframe(
+    # Tableau statique (n_regions lignes) : pas de grille interactive nécessaire
+    st.table(
         g_y[["nom_region", "annee", "taux_region_pour_mille", "variation_region", "nb_region", "pop_region"]]
-          .sort_values("taux_region_pour_mille", ascending=False),
-        use_container_width=True
+          .sort_values("taux_region_pour_mille", ascending=False)
+          .round({"taux_region_pour_mille": 2, "variation_region": 2})
+          .reset_index(drop=True)
     )
 
 
@@ -1,8 +1,9 @@
+import numpy as np
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 
-from utils import load_data, build_region_metrics
+from utils import load_data, load_region_metrics
 
 
 def guess_class_col(df: pd.DataFrame) -> str | None:
@@ -28,14 +29,119 @@ def guess_commune_col(df: pd.DataFrame) -> str | None:
     return None
 
 
+@st.cache_data(show_spinner=False)
+def build_heatmap_pivots(g: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """Pivots région × année des deux variables, triés par moyenne décroissante (colonne `_mean`)."""
+    return {
+        m: (
+            g.pivot_table(index="nom_region", columns="annee", values=m, aggfunc="mean", observed=True)
+             .assign(_mean=lambda d: d.mean(axis=1))
+             .sort_values("_mean", ascending=False)
+        )
+        for m in ["taux_region_pour_mille", "variation_region"]
+    }
+
+
+@st.cache_data(show_spinner=False)
+def rolling_table(g: pd.DataFrame) -> pd.DataFrame:
+    """Moyennes mobiles du taux par région pour toutes les fenêtres du slider (2 à 5 ans), colonne `_w`."""
+    g = g.sort_values(["nom_region", "annee"])
+    return pd.concat(
+        [
+            g.assign(
+                taux_lisse=g.groupby("nom_region", observed=True)["taux_region_pour_mille"]
+                            .transform(lambda s: s.rolling(window=w, min_periods=1).mean()),
+                _w=w,
+            )
+            for w in range(2, 6)
+        ],
+        ignore_index=True,
+    )
+
+
+@st.cache_data(show_spinner=False)
+def repartition_cube(class_col: str) -> pd.DataFrame:
+    """Somme de `nombre` par année × région × indicateur détaillé × grande catégorie."""
+    df = load_data()
+    keys = ["annee"] + (["nom_region"] if "nom_region" in df.columns else [])
+    keys += list(dict.fromkeys([class_col, "categorie_indicateur"]))
+    return df.groupby(keys, observed=True, dropna=False, as_index=False)["nombre"].sum()
+
+
+@st.cache_data(show_spinner=False)
+def load_communes_ref() -> pd.DataFrame:
+    """Table unique des communes avec un libellé 'nom (département, région) — INSEE code'."""
+    df = load_data()
+    # groupby-first sur le code INSEE : une passe, sans hash des 4 colonnes comme drop_duplicates
+    communes_ref = (
+        df.groupby("CODGEO_2025", sort=False, observed=True)
+          .agg(
+              nom_commune=("nom_commune", "first"),
+              nom_departement=("nom_departement", "first"),
+              nom_region=("nom_region", "first"),
+          )
+          .reset_index()
+    )
+    communes_ref["label"] = (
+        communes_ref["nom_commune"].astype(str)
+        + " (" + communes_ref["nom_departement"].astype(str)
+        + ", " + communes_ref["nom_region"].astype(str)
+        + ") — INSEE " + communes_ref["CODGEO_2025"].astype(str)
+    )
+    communes_ref["nom_lower"] = communes_ref["nom_commune"].astype(str).str.lower()
+    return communes_ref
+
+
+# Nombre minimal de caractères avant de filtrer la liste des communes
+MIN_SEARCH_CHARS = 2
+
+
+# Une entrée par texte recherché (jusqu'à ~35k libellés) : cache borné, les plus anciennes sont évincées
+@st.cache_data(show_spinner=False, max_entries=256)
+def commune_options(q_lower: str) -> list[str]:
+    """Libellés des communes contenant `q_lower` (déjà en minuscules) ; 3000 premiers par nom si vide."""
+    communes_ref = load_communes_ref()
+    if not q_lower:
+        return communes_ref.sort_values("nom_commune")["label"].head(3000).tolist()  # limite sécurité
+    mask = communes_ref["nom_lower"].str.contains(q_lower, regex=False)
+    return communes_ref.loc[mask, "label"].tolist()
+
+
+@st.cache_resource(show_spinner=False)
+def load_data_by_insee() -> pd.DataFrame:
+    """Données indexées (et triées) par code INSEE — partagées, à traiter en lecture seule."""
+    return load_data().set_index("CODGEO_2025").sort_index()
+
+
+@st.cache_data(show_spinner=False)
+def commune_agg(year: int, region: str, commune_col: str, has_pop: bool) -> pd.DataFrame:
+    """Agrégat par commune (nombre, population, taux ‰) pour une année et une région."""
+    df = load_data()
+    dcom = df[(df["annee"] == year) & (df["nom_region"] == region)]
+
+    dcom_g = (
+        dcom.groupby(commune_col, as_index=False, observed=True)
+        .agg(**{
+            "nb_commune": ("nombre", "sum"),
+            **({"pop_commune": ("insee_pop", "max")} if has_pop else {})
+        })
+    )
+
+    if has_pop:
+        dcom_g = dcom_g[dcom_g["pop_commune"] > 0]
+        dcom_g = dcom_g.assign(taux_commune_pour_mille=1000 * (dcom_g["nb_commune"] / dcom_g["pop_commune"]))
+    else:
+        dcom_g["taux_commune_pour_mille"] = pd.NA
+    return dcom_g
+
+
 st.set_page_config(page_title="Tableau de Bord Analytique", layout="wide")
 st.title("📈 Tableau de Bord — Analyse du taux de délinquance")
 
 # -----------------------------
-# Chargement
+# Chargement (agrégat région-année ; les données détaillées sont chargées en section 6)
 # -----------------------------
-df = load_data()
-g = build_region_metrics(df)
+g = load_region_metrics()
 
 # -----------------------------
 # 1) Courbes par région
@@ -50,7 +156,7 @@ sel_regions = st.multiselect(
     key="reg_select_main"
 )
 
-g_sel = g[g["nom_region"].isin(sel_regions)].copy()
+g_sel = g[g["nom_region"].isin(sel_regions)]
 
 c1, c2 = st.columns(2)
 
@@ -111,7 +217,14 @@ st.caption(
 )
 
 with st.expander("Voir les données région-année (brutes)", expanded=False):
-    st.dataframe(g.sort_values(["nom_region", "annee"]), use_container_width=True)
+    st.dataframe(
+        g.sort_values(["nom_region", "annee"]),
+        use_container_width=True,
+        column_config={
+            "taux_region_pour_mille": st.column_config.NumberColumn(format="%.2f"),
+            "variation_region": st.column_config.NumberColumn(format="%.2f"),
+        },
+    )
 
 st.divider()
 
@@ -134,14 +247,7 @@ top_n_heat = st.slider(
     key="hm_topn"
 )
 
-pivot = g.pivot_table(
-    index="nom_region",
-    columns="annee",
-    values=metric_hm,
-    aggfunc="mean",
-)
-
-pivot = pivot.loc[pivot.mean(axis=1).sort_values(ascending=False).head(top_n_heat).index]
+pivot = build_heatmap_pivots(g)[metric_hm].head(top_n_heat).drop(columns="_mean")
 
 fig_hm = px.imshow(
     pivot,
@@ -189,8 +295,8 @@ reg_roll = st.selectbox(
 )
 window = st.slider("Fenêtre (années)", 2, 5, 3, key="roll_window")
 
-gr = g[g["nom_region"] == reg_roll].sort_values("annee").copy()
-gr["taux_lisse"] = gr["taux_region_pour_mille"].rolling(window=window, min_periods=1).mean()
+rt = rolling_table(g)
+gr = rt[(rt["nom_region"] == reg_roll) & (rt["_w"] == window)]
 
 fig_roll = px.line(
     gr,
@@ -212,6 +318,9 @@ st.divider()
 # -----------------------------
 st.header("🧾 Répartition par type d’infraction (détaillé vs 5 grandes classes)")
 
+# Données détaillées : chargées seulement ici, après le rendu des sections 1 à 5
+df = load_data()
+
 class_col = guess_class_col(df)
 if class_col is None:
     st.warning(
@@ -243,29 +352,31 @@ level = st.radio(
 
 group_col = class_col if level == "Détaillé" else "categorie_indicateur"
 
-d = df[df["annee"] == year_rep].copy()
-if region_rep != "Toutes":
-    d = d[d["nom_region"] == region_rep]
-
-if "nombre" not in d.columns:
+if "nombre" not in df.columns:
     st.error("Colonne `nombre` absente : impossible de calculer la répartition.")
     st.stop()
 
+# Sections 6 et 7 : on découpe le même cube agrégé (quelques milliers de lignes)
+cube = repartition_cube(class_col)
+
+d = cube[cube["annee"] == year_rep]
+if region_rep != "Toutes":
+    d = d[d["nom_region"] == region_rep]
+
 rep = (
-    d.groupby(group_col, as_index=False)
+    d.groupby(group_col, as_index=False, observed=True)
      .agg(nb=("nombre", "sum"))
-     .sort_values("nb", ascending=False)
 )
 
 topn_rep = st.slider("Nombre de catégories affichées", 5, 25, 10, key="rep_topn")
 
+top = rep.nlargest(topn_rep, "nb")
 if len(rep) > topn_rep:
-    top = rep.head(topn_rep).copy()
-    autres = rep.iloc[topn_rep:]["nb"].sum()
-    top.loc[len(top)] = ["Autres", autres]
-    rep_plot = top
+    autres = rep["nb"].sum() - top["nb"].sum()
+    # concat (et non .loc) : "Autres" n'est pas une catégorie de `categorie_indicateur`
+    rep_plot = pd.concat([top, pd.DataFrame({group_col: ["Autres"], "nb": [autres]})], ignore_index=True)
 else:
-    rep_plot = rep
+    rep_plot = top
 
 c1, c2 = st.columns([1.2, 1])
 
@@ -288,7 +399,7 @@ with c2:
     st.caption("Poids relatif de chaque catégorie dans l’ensemble des infractions observées.")
 
 with st.expander("Voir la table complète (année / région sélectionnées)", expanded=False):
-    st.dataframe(rep, use_container_width=True)
+    st.dataframe(rep.sort_values("nb", ascending=False), use_container_width=True)
 
 st.divider()
 
@@ -297,7 +408,7 @@ st.divider()
 # -----------------------------
 st.header("📈 Évolution de la composition (par année)")
 
-d2 = df.copy()
+d2 = cube
 
 if "nom_region" in df.columns:
     region_stack = st.selectbox("Région (pour l’évolution)", ["Toutes"] + regions_df, key="stack_region")
@@ -307,21 +418,25 @@ if "nom_region" in df.columns:
 group_stack = class_col if level == "Détaillé" else "categorie_indicateur"
 
 comp = (
-    d2.groupby(["annee", group_stack], as_index=False)
+    d2.groupby(["annee", group_stack], as_index=False, observed=True)
       .agg(nb=("nombre", "sum"))
 )
 
 if level == "Détaillé":
     topk_stack = st.slider("Nombre de catégories conservées (détaillé)", 3, 12, 6, key="stack_topk")
     top_classes = (
-        comp.groupby(group_stack)["nb"].sum()
-            .sort_values(ascending=False)
-            .head(topk_stack)
+        comp.groupby(group_stack, observed=True)["nb"].sum()
+            .nlargest(topk_stack)
             .index
             .tolist()
     )
-    comp[group_stack] = comp[group_stack].where(comp[group_stack].isin(top_classes), "Autres")
-    comp = comp.groupby(["annee", group_stack], as_index=False)["nb"].sum()
+    # Remap en une passe vers un catégoriel (top + "Autres"), puis un seul groupby observé
+    mask = comp[group_stack].isin(top_classes).to_numpy()
+    codes = np.where(mask, comp[group_stack].to_numpy(), "Autres")
+    comp = (
+        comp.assign(**{group_stack: pd.Categorical(codes, categories=top_classes + ["Autres"])})
+            .groupby(["annee", group_stack], observed=True, as_index=False)["nb"].sum()
+    )
 
 fig_area = px.area(
     comp.sort_values("annee"),
@@ -330,6 +445,8 @@ fig_area = px.area(
     color=group_stack,
     labels={"annee": "Année", "nb": "Nombre", group_stack: "Catégorie"},
 )
+fig_area.update_traces(mode="lines", line_shape="linear")
+fig_area.update_layout(uirevision="keep")
 st.plotly_chart(fig_area, use_container_width=True)
 st.caption(
     "Ce graphique montre comment la **structure** des infractions évolue dans le temps : "
@@ -359,45 +476,32 @@ else:
 
     ranking_mode = st.radio("Classer par", ["Taux (‰)", "Nombre d’infractions"], horizontal=True, key="comm_rank_mode")
 
-    dcom = df[(df["annee"] == year_comm) & (df["nom_region"] == region_comm)].copy()
-
-    if "nombre" not in dcom.columns:
+    if "nombre" not in df.columns:
         st.error("Colonne `nombre` absente : impossible de calculer le top communes.")
         st.stop()
 
-    has_pop = "insee_pop" in dcom.columns
+    has_pop = "insee_pop" in df.columns
 
-    dcom_g = (
-        dcom.groupby(commune_col, as_index=False)
-        .agg(**{
-            "nb_commune": ("nombre", "sum"),
-            **({"pop_commune": ("insee_pop", "max")} if has_pop else {})
-        })
-    )
-
-    if has_pop:
-        dcom_g = dcom_g[dcom_g["pop_commune"] > 0].copy()
-        dcom_g["taux_commune_pour_mille"] = 1000 * (dcom_g["nb_commune"] / dcom_g["pop_commune"])
-    else:
-        dcom_g["taux_commune_pour_mille"] = pd.NA
+    # Agrégat mis en cache par (année, région) : changer de mode de classement ne recalcule rien
+    dcom_g = commune_agg(year_comm, region_comm, commune_col, has_pop)
 
     if ranking_mode == "Nombre d’infractions":
-        dcom_top = dcom_g.sort_values("nb_commune", ascending=False).head(20)
+        dcom_top = dcom_g.nlargest(20, "nb_commune")
         y_col = "nb_commune"
         y_label = "Nombre d’infractions"
     else:
         if not has_pop:
             st.warning("Pas de colonne `insee_pop` → impossible de classer par taux. Classement par nombre.")
-            dcom_top = dcom_g.sort_values("nb_commune", ascending=False).head(20)
+            dcom_top = dcom_g.nlargest(20, "nb_commune")
             y_col = "nb_commune"
             y_label = "Nombre d’infractions"
         else:
-            dcom_top = dcom_g.sort_values("taux_commune_pour_mille", ascending=False).head(20)
+            dcom_top = dcom_g.nlargest(20, "taux_commune_pour_mille")
             y_col = "taux_commune_pour_mille"
             y_label = "Taux (‰)"
 
     fig_comm = px.bar(dcom_top, x=commune_col, y=y_col, labels={commune_col: "Commune", y_col: y_label})
-    fig_comm.update_layout(xaxis_tickangle=-35)
+    fig_comm.update_layout(xaxis_tickangle=-35, uirevision="keep")
     st.plotly_chart(fig_comm, use_container_width=True)
     st.caption("Top 20 communes de la région sélectionnée (en taux ou en volume selon l’option).")
 
@@ -405,7 +509,7 @@ else:
     if has_pop:
         cols_show += ["pop_commune", "taux_commune_pour_mille"]
 
-    st.dataframe(dcom_top[cols_show].reset_index(drop=True), use_container_width=True)
+    st.table(dcom_top[cols_show].round({"taux_commune_pour_mille": 2}).reset_index(drop=True))
 
 st.divider()
 
@@ -431,17 +535,6 @@ if missing:
     st.warning("Impossible d’activer la recherche : colonnes manquantes : " + ", ".join(missing))
     st.stop()
 
-# Table unique des communes
-communes_ref = (
-    df[["CODGEO_2025", "nom_commune", "nom_departement", "nom_region"]]
-    .drop_duplicates()
-    .copy()
-)
-communes_ref["label"] = communes_ref.apply(
-    lambda r: f"{r['nom_commune']} ({r['nom_departement']}, {r['nom_region']}) — INSEE {r['CODGEO_2025']}",
-    axis=1
-)
-
 # Filtre (pour éviter une selectbox gigantesque)
 q = st.text_input(
     "Filtrer la liste (ex : Lille, Saint, Bordeaux...)",
@@ -449,10 +542,8 @@ q = st.text_input(
     key="search_filter_text"
 ).strip()
 
-if q:
-    options = communes_ref[communes_ref["nom_commune"].str.contains(q, case=False, na=False)]["label"].tolist()
-else:
-    options = communes_ref.sort_values("nom_commune")["label"].head(3000).tolist()  # limite sécurité
+# Recherche déclenchée à partir de MIN_SEARCH_CHARS caractères, mémorisée par requête
+options = commune_options(q.lower() if len(q) >= MIN_SEARCH_CHARS else "")
 
 if not options:
     st.warning("Aucune commune trouvée avec ce filtre.")
@@ -462,12 +553,12 @@ else:
     # Extraction du code INSEE depuis le label
     insee = choice.split("INSEE ")[-1].strip()
 
-    d0 = df[df["CODGEO_2025"].astype(str) == str(insee)].copy()
+    d0 = load_data_by_insee().loc[[insee]].reset_index()
 
     years_s = sorted([int(y) for y in d0["annee"].dropna().unique()])
     year_s = st.selectbox("Année", years_s, index=len(years_s) - 1, key="search_year_select")
 
-    d = d0[d0["annee"] == year_s].copy()
+    d = d0[d0["annee"] == year_s]
 
     st.subheader(f"📍 {d['nom_commune'].iloc[0]} — {year_s} (INSEE {insee})")
 
@@ -486,9 +577,8 @@ else:
 
     # Évolution du taux (si dispo)
     if "taux_calcule_pour_mille" in d0.columns:
-        d0["taux_calcule_pour_mille"] = pd.to_numeric(d0["taux_calcule_pour_mille"], errors="coerce")
         evol = (
-            d0.groupby("annee", as_index=False)
+            d0.groupby("annee", as_index=False, observed=True)
               .agg(taux=("taux_calcule_pour_mille", "mean"))
               .sort_values("annee")
         )
@@ -498,9 +588,8 @@ else:
 
     # Répartition par grandes catégories (si dispo)
     if "categorie_indicateur" in d.columns and "nombre" in d.columns:
-        d["nombre"] = pd.to_numeric(d["nombre"], errors="coerce")
         repc = (
-            d.groupby("categorie_indicateur", as_index=False)
+            d.groupby("categorie_indicateur", as_index=False, observed=True)
              .agg(nb=("nombre", "sum"))
              .sort_values("nb", ascending=False)
         )
@@ -1,13 +1,26 @@
 from __future__ import annotations
 
 import json
+import operator
+import os
+import re
 import unicodedata
+from functools import lru_cache
 from pathlib import Path
 from typing import Tuple
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 import streamlit as st
 
+try:  # parseur JSON rapide (optionnel)
+    import orjson
+except ImportError:
+    orjson = None
+
 
 # -----------------------------------------------------------------------------
 # PATHS (robustes) - ADAPTÉS À TON ARBORESCENCE
@@ -16,16 +29,19 @@ def get_project_paths(
     base_dir: Path | None = None,
     data_dirname: str = "Data",  # ✅ ton dossier s'appelle "Data" (majuscule)
     data_filename: str = "communes_clean.csv",
-    geojson_filename: str = "regions.geojson",
+    geojson_filename: str = "regions_simplified.geojson",  # version allégée pour la carte
 ) -> tuple[Path, Path]:
     """
     Retourne (data_path, geojson_path) avec chemins robustes.
+    regions_simplified.geojson est générée depuis regions.geojson par
+    01_Notebooks/simplify_geojson.py.
 
     Ta structure :
     PROJET DATA/
       Data/
         communes_clean.csv
         regions.geojson
+        regions_simplified.geojson
       streamlit/
         utils.py
         app.py
@@ -43,35 +59,76 @@ def get_project_paths(
     return data_path, geojson_path
 
 
+# Colonnes lues par l'application (projection à la lecture du Parquet / CSV)
+APP_COLUMNS = [
+    "CODGEO_2025", "annee", "indicateur", "nombre", "insee_pop",
+    "taux_pour_mille", "taux_calcule_pour_mille",
+    "niveau_delinquance", "taille_commune", "categorie_indicateur",
+    "nom_commune", "nom_departement", "nom_region",
+]
+
+# Agrégat région-année pré-calculé (sortie de build_region_metrics), exporté par le notebook
+REGION_AGG_FILENAME = "regions_agg.parquet"
+
+# Version du calcul de build_region_metrics : à incrémenter dès que sa logique ou ses
+# dtypes changent, pour invalider regions_agg.parquet et le cache disque .region_metrics.*
+REGION_METRICS_VERSION = 1
+_REGION_METRICS_VERSION_KEY = b"region_metrics_version"
+
+# Colonnes à faible cardinalité stockées en dtype "category"
+CATEGORICAL_COLS = ["nom_region", "nom_region_norm", "categorie_indicateur", "taille_commune"]
+
+
 # -----------------------------------------------------------------------------
 # NORMALISATION
 # -----------------------------------------------------------------------------
+# Diacritiques combinants usuels (bloc U+0300–U+036F, après NFD) et suites d'espaces
+_COMBINING_RE = re.compile(r"[\u0300-\u036f]+")
+_WS_RE = re.compile(r"\s+")
+
+
 def norm_str(s: str) -> str:
     """Normalise une chaîne (sans accents, minuscules, espaces clean)."""
     if s is None:
         return ""
-    s = str(s).strip().lower()
-    s = unicodedata.normalize("NFD", s)
-    s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")  # remove accents
-    s = " ".join(s.split())
-    return s
+    return _norm_str_cached(str(s))
+
+
+@lru_cache(maxsize=4096)
+def _norm_str_cached(s: str) -> str:
+    """
+    Cœur de norm_str, mémoïsé (peu de valeurs distinctes : noms de régions).
+    Retire toutes les marques de catégorie Mn : la regex couvre le bloc usuel
+    U+0300–U+036F, le filtre par caractère ne sert que s'il reste du non-ASCII.
+    """
+    s = s.strip().lower()
+    if not s.isascii():  # en ASCII, aucun accent possible : pas de NFD
+        s = unicodedata.normalize("NFD", s)
+        s = _COMBINING_RE.sub("", s)  # remove accents
+        if not s.isascii():  # autres marques (U+1AB0, U+20D7...)
+            s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
+    # strip final : une marque retirée peut laisser un espace en bord de chaîne
+    return _WS_RE.sub(" ", s).strip()
+
+
+# Clés usuelles du nom de région dans les properties GeoJSON (par ordre de priorité)
+_REGION_KEY_CANDIDATES = (
+    "nom", "Nom", "NOM",
+    "name", "Name", "NAME",
+    "region", "REGION",
+    "libelle", "LIBELLE",
+    "nom_region", "NOM_REGION",
+)
 
 
 def guess_geojson_region_key(geojson: dict) -> str:
     """Devine la clé contenant le nom de région dans properties."""
-    features = geojson.get("features", [])
+    features = geojson.get("features") or []
     if not features:
         return "nom"
 
-    props = features[0].get("properties", {}) or {}
-    candidates = [
-        "nom", "Nom", "NOM",
-        "name", "Name", "NAME",
-        "region", "REGION",
-        "libelle", "LIBELLE",
-        "nom_region", "NOM_REGION",
-    ]
-    for k in candidates:
+    props = features[0].get("properties") or {}
+    for k in _REGION_KEY_CANDIDATES:
         if k in props:
             return k
 
@@ -80,55 +137,207 @@ def guess_geojson_region_key(geojson: dict) -> str:
         if isinstance(v, str) and v.strip():
             return k
 
-    return list(props.keys())[0] if props else "nom"
+    return next(iter(props), "nom")
 
 
 # -----------------------------------------------------------------------------
 # LOADERS (Streamlit cache)
 # -----------------------------------------------------------------------------
+def _parquet_is_fresh(data_path: Path) -> bool:
+    """True si le Parquet voisin du CSV existe et est au moins aussi récent que lui."""
+    parquet_path = data_path.with_suffix(".parquet")
+    return parquet_path.exists() and (
+        not data_path.exists() or parquet_path.stat().st_mtime >= data_path.stat().st_mtime
+    )
+
+
+def _parquet_columns(path: Path) -> list[str] | None:
+    """Colonnes du Parquet, ou None s'il est illisible (fichier tronqué, corrompu)."""
+    try:
+        return pq.read_schema(path).names
+    except (pa.ArrowInvalid, OSError):
+        return None
+
+
+def _write_parquet_atomic(table: pa.Table, path: Path) -> None:
+    """
+    Écrit le Parquet dans un fichier temporaire du même dossier, puis le renomme :
+    un arrêt pendant l'écriture ne laisse jamais de fichier tronqué à `path`.
+    """
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def _read_csv_table(data_path: Path, columns: list[str] | None = None) -> pa.Table:
+    """
+    Lecteur CSV pyarrow (multi-thread). Le code INSEE est typé chaîne dès le parsing :
+    sinon un fichier sans code 2A/2B le lirait en entier ("01001" -> 1001).
+    """
+    return pa_csv.read_csv(
+        data_path,
+        parse_options=pa_csv.ParseOptions(delimiter=","),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={"CODGEO_2025": pa.string()},
+            include_columns=columns,
+        ),
+    )
+
+
 @st.cache_data(show_spinner=False)
 def load_data(data_path: Path | None = None) -> pd.DataFrame:
     """
-    Charge le CSV et prépare les colonnes nécessaires.
+    Charge les données nettoyées et prépare les colonnes nécessaires.
+    Lit en priorité la version Parquet (même nom, extension .parquet) si elle est
+    au moins aussi récente que le CSV ; sinon lit le CSV et écrit ce Parquet (toutes
+    les colonnes) pour les démarrages suivants. Seules les colonnes de APP_COLUMNS
+    sont gardées en mémoire ; les autres sont décrites par load_columns_profile().
     Si data_path est None, utilise get_project_paths().
     """
     if data_path is None:
         data_path, _ = get_project_paths()
 
-    if not data_path.exists():
-        raise FileNotFoundError(
-            f"CSV introuvable : {data_path}\n"
-            f"(Vérifie que le fichier est bien dans PROJET DATA/Data/)"
-        )
-
-    df = pd.read_csv(data_path, sep=",", dtype={0: str, "CODGEO_2025": str}, low_memory=False)
-
-    if "annee" in df.columns:
-        df["annee"] = pd.to_numeric(df.get("annee"), errors="coerce").astype("Int64")
-
-    for c in ["nombre", "insee_pop"]:
-        if c in df.columns:
+    parquet_path = data_path.with_suffix(".parquet")
+
+    df = None
+    if _parquet_is_fresh(data_path):
+        try:
+            available = set(pq.read_schema(parquet_path).names)
+            df = pd.read_parquet(parquet_path, columns=[c for c in APP_COLUMNS if c in available])
+        except (pa.ArrowInvalid, OSError):
+            if not data_path.exists():
+                raise
+            # Parquet illisible (ex. écriture interrompue) : considéré périmé, reconstruit depuis le CSV
+
+    if df is None:
+        if not data_path.exists():
+            raise FileNotFoundError(
+                f"CSV introuvable : {data_path}\n"
+                f"(Vérifie que le fichier est bien dans PROJET DATA/Data/)"
+            )
+        table = _read_csv_table(data_path)
+        # Sidecar Parquet complet : les démarrages suivants évitent le parsing CSV
+        try:
+            _write_parquet_atomic(table, parquet_path)
+        except OSError:
+            pass  # dossier en lecture seule : on garde simplement le CSV
+        df = table.select([c for c in APP_COLUMNS if c in table.column_names]).to_pandas()
+
+    # pd.to_numeric seulement si la colonne n'arrive pas déjà typée (Parquet, CSV bien formé)
+    if "annee" in df.columns and not pd.api.types.is_integer_dtype(df["annee"]):
+        df["annee"] = pd.to_numeric(df["annee"], errors="coerce")
+
+    for c in ["nombre", "insee_pop", "taux_calcule_pour_mille"]:
+        if c in df.columns and not pd.api.types.is_numeric_dtype(df[c]):
             df[c] = pd.to_numeric(df[c], errors="coerce")
 
+    # Coercitions faites une fois ici (et non à chaque interaction dans les pages)
+    if "nombre" in df.columns:
+        df["nombre"] = df["nombre"].astype("Int32")
+    if "taux_calcule_pour_mille" in df.columns:
+        df["taux_calcule_pour_mille"] = df["taux_calcule_pour_mille"].astype("float32")
+
     # On retire les lignes non diffusées
     if "nombre" in df.columns and "insee_pop" in df.columns:
-        df = df[df["nombre"].notna() & df["insee_pop"].notna()]
+        df = df.dropna(subset=["nombre", "insee_pop"])
+        # Sans NaN, la population tient en entier non signé 32 bits (2x moins d'octets à scanner)
+        df["insee_pop"] = pd.to_numeric(df["insee_pop"], downcast="unsigned")
 
-    # Normalisation région
+    # Normalisation région : une fois par valeur distincte (~20 régions), pas par ligne
     if "nom_region" in df.columns:
-        df["nom_region_norm"] = df["nom_region"].map(norm_str)
+        mapping = {v: norm_str(v) for v in df["nom_region"].dropna().unique()}
+        df["nom_region_norm"] = df["nom_region"].map(mapping)
+
+    # Types compacts : codes entiers au lieu de chaînes Python pour les filtres / groupby
+    if "annee" in df.columns:
+        df["annee"] = df["annee"].astype("Int16")
+    for c in CATEGORICAL_COLS:
+        if c in df.columns:
+            df[c] = df[c].astype("category")
 
     return df
 
 
+def _load_data_shared(data_path: Path | None) -> pd.DataFrame:
+    """
+    Appelle load_data() exactement comme les pages quand data_path est None :
+    st.cache_data indexe sur les arguments passés, load_data(None) et load_data()
+    seraient deux entrées (deux lectures et deux copies du jeu complet).
+    """
+    return load_data() if data_path is None else load_data(data_path)
+
+
 @st.cache_data(show_spinner=False)
-def load_geojson(geojson_path: Path | None = None) -> dict:
+def load_columns_profile(data_path: Path | None = None) -> pd.DataFrame:
+    """
+    Profil de toutes les colonnes du jeu (y compris celles hors APP_COLUMNS) :
+    type et nombre de valeurs manquantes sur les lignes gardées par load_data().
+    Les colonnes non chargées sont lues une à une depuis le Parquet (sinon en une
+    seule passe sur le CSV), sans rester en mémoire.
+    Retourne un DataFrame [Variable, Type, n_manquants].
+    """
+    df = _load_data_shared(data_path)
+    if data_path is None:
+        data_path, _ = get_project_paths()
+
+    if data_path.exists():
+        source_cols = list(pd.read_csv(data_path, sep=",", nrows=0).columns)
+    else:
+        source_cols = pq.read_schema(data_path.with_suffix(".parquet")).names
+    extra = [c for c in source_cols if c not in df.columns]
+
+    profile = {}
+    if extra:
+        parquet_path = data_path.with_suffix(".parquet")
+        from_parquet = _parquet_is_fresh(data_path) and set(extra) <= set(_parquet_columns(parquet_path) or [])
+
+        # Mêmes lignes que load_data : on retire les lignes non diffusées
+        mask_cols = ["nombre", "insee_pop"] if {"nombre", "insee_pop"} <= set(source_cols) else []
+        kept = slice(None)
+
+        if from_parquet:
+            # Colonne par colonne : une seule colonne supplémentaire en mémoire à la fois
+            if mask_cols:
+                kept = pd.read_parquet(parquet_path, columns=mask_cols).notna().all(axis=1).to_numpy()
+            columns = ((c, pd.read_parquet(parquet_path, columns=[c])[c]) for c in extra)
+        else:
+            # CSV : une seule passe pour toutes les colonnes manquantes
+            raw = _read_csv_table(data_path, mask_cols + extra).to_pandas()
+            if mask_cols:
+                kept = raw[mask_cols].notna().all(axis=1).to_numpy()
+            columns = ((c, raw[c]) for c in extra)
+
+        for c, col in columns:
+            col = col[kept]
+            profile[c] = (str(col.dtype), int(col.isna().sum()))
+
+    for c in df.columns:
+        profile[c] = (str(df[c].dtype), int(df[c].isna().sum()))
+
+    order = source_cols + [c for c in df.columns if c not in source_cols]
+    return pd.DataFrame(
+        [(c, *profile[c]) for c in order],
+        columns=["Variable", "Type", "n_manquants"],
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def load_geojson(geojson_path: Path | None = None) -> Tuple[dict, str]:
     """
-    Charge le GeoJSON (texte -> dict) de façon stable pour le cache.
-    Si geojson_path est None, utilise get_project_paths().
+    Charge le GeoJSON (texte -> dict), partagé entre les reruns (lecture seule).
+    Ajoute properties['region_norm'] dans chaque feature pour faciliter le merge Plotly,
+    directement sur le dict parsé (aucune copie).
+    Retourne (geojson, clé_detectée_du_nom_de_région).
+    Si geojson_path est None, utilise get_project_paths() (version simplifiée),
+    ou regions.geojson si celle-ci n'a pas été générée. Un chemin explicite est lu tel quel.
     """
     if geojson_path is None:
         _, geojson_path = get_project_paths()
+        if not geojson_path.exists():
+            _, geojson_path = get_project_paths(geojson_filename="regions.geojson")
 
     if not geojson_path.exists():
         raise FileNotFoundError(
@@ -136,30 +345,57 @@ def load_geojson(geojson_path: Path | None = None) -> dict:
             f"(Vérifie que le fichier est bien dans PROJET DATA/Data/)"
         )
 
-    text = geojson_path.read_text(encoding="utf-8")
-    return json.loads(text)
+    # orjson parse directement les octets (sans décodage UTF-8 préalable)
+    if orjson is not None:
+        gj = orjson.loads(geojson_path.read_bytes())
+    else:
+        gj = json.loads(geojson_path.read_text(encoding="utf-8"))
 
-
-@st.cache_data(show_spinner=False)
-def geojson_with_norm_names(geojson: dict) -> Tuple[dict, str]:
-    """
-    Ajoute properties['region_norm'] dans chaque feature pour faciliter le merge Plotly.
-    Retourne (geojson_modifié, clé_detectée_du_nom_de_région).
-    """
-    gj = json.loads(json.dumps(geojson))  # deep copy safe
+    # Clé détectée une seule fois ; accès direct par itemgetter dans la boucle
     key = guess_geojson_region_key(gj)
-
+    get_name = operator.itemgetter(key)
     for feat in gj.get("features", []):
-        props = feat.setdefault("properties", {})
-        props["region_norm"] = norm_str(props.get(key, ""))
+        props = feat.get("properties")
+        if props is None:
+            props = {}
+            feat["properties"] = props
+        try:
+            name = get_name(props)
+        except KeyError:
+            name = ""
+        props["region_norm"] = norm_str(name)
 
     return gj, key
 
 
+@st.cache_resource(show_spinner=False)
+def geojson_for_plot(
+    geojson_path: Path | None = None,
+    keep: Tuple[str, ...] = ("region_norm",),
+) -> dict:
+    """
+    Version allégée du GeoJSON pour Plotly : ne garde que les properties utiles
+    (featureidkey) afin de réduire le JSON envoyé au navigateur à chaque rerun.
+    Clé de cache = chemin (pas le dict) : aucun hash du GeoJSON à chaque rerun.
+    Les géométries sont partagées par référence (lecture seule).
+    """
+    geojson_norm, _ = load_geojson(geojson_path)
+    return {
+        "type": geojson_norm.get("type", "FeatureCollection"),
+        "features": [
+            {
+                "type": feat.get("type", "Feature"),
+                "geometry": feat.get("geometry"),
+                "properties": {k: (feat.get("properties") or {}).get(k) for k in keep},
+            }
+            for feat in geojson_norm.get("features", [])
+        ],
+    }
+
+
 # -----------------------------------------------------------------------------
 # METRICS
 # -----------------------------------------------------------------------------
-@st.cache_data(show_spinner=False)
 def build_region_metrics(df: pd.DataFrame) -> pd.DataFrame:
     """
     Table région-année :
@@ -173,23 +409,100 @@ def build_region_metrics(df: pd.DataFrame) -> pd.DataFrame:
     if missing:
         raise KeyError(f"Colonnes manquantes dans le CSV : {missing}")
 
+    # Le groupby trié renvoie déjà les lignes par (région, année) : pas de sort_values ensuite
     g = (
-        df.groupby(["nom_region", "nom_region_norm", "annee"], as_index=False)
+        df.groupby(["nom_region", "nom_region_norm", "annee"], as_index=False, observed=True)
           .agg(
               nb_region=("nombre", "sum"),
               pop_region=("insee_pop", "sum"),
           )
     )
 
-    g["pop_region"] = g["pop_region"].replace({0: pd.NA})
-    g["taux_region_pour_mille"] = 1000 * (g["nb_region"] / g["pop_region"])
-
-    g = g.sort_values(["nom_region", "annee"])
-    g["variation_region"] = (
-        g.groupby("nom_region")["taux_region_pour_mille"]
-         .diff()
-         .fillna(0)
+    # Division float64 sans branche : NaN là où la population est nulle
+    nb = g["nb_region"].to_numpy(dtype="float64", na_value=np.nan)
+    pop = g["pop_region"].to_numpy(dtype="float64", na_value=np.nan)
+    g["taux_region_pour_mille"] = 1000.0 * np.divide(
+        nb, pop, out=np.full_like(nb, np.nan), where=pop != 0
     )
+    g["pop_region"] = g["pop_region"].mask(g["pop_region"].eq(0))
+
+    # Variation annuelle en une passe NumPy : diff entre lignes consécutives d'une même région
+    taux = g["taux_region_pour_mille"].to_numpy(dtype="float64", na_value=np.nan)
+    codes = pd.factorize(g["nom_region"])[0]
+    variation = np.zeros_like(taux)
+    variation[1:] = np.where(codes[1:] == codes[:-1], taux[1:] - taux[:-1], 0.0)
+    g["variation_region"] = np.where(np.isnan(variation), 0.0, variation)
+    return g
+
+
+def save_region_metrics(g: pd.DataFrame, path: Path) -> None:
+    """Écrit la table région-année en Parquet, marquée de REGION_METRICS_VERSION."""
+    table = pa.Table.from_pandas(g, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[_REGION_METRICS_VERSION_KEY] = str(REGION_METRICS_VERSION).encode()
+    _write_parquet_atomic(table.replace_schema_metadata(metadata), path)
+
+
+def _is_current_region_metrics(path: Path) -> bool:
+    """True si le Parquet a été écrit par save_region_metrics avec la version courante (et est lisible)."""
+    try:
+        metadata = pq.read_schema(path).metadata or {}
+    except (pa.ArrowInvalid, OSError):
+        return False
+    return metadata.get(_REGION_METRICS_VERSION_KEY) == str(REGION_METRICS_VERSION).encode()
+
+
+@st.cache_data(show_spinner=False)
+def load_region_metrics(data_path: Path | None = None) -> pd.DataFrame:
+    """
+    Table région-année mise en cache (une seule agrégation par fichier).
+    Lit directement l'agrégat exporté par le notebook (REGION_AGG_FILENAME, à côté
+    des données) s'il est à jour et de la version REGION_METRICS_VERSION : le jeu
+    complet n'est alors pas chargé.
+    Sinon, relit le cache disque `.region_metrics.v<version>.<mtime>-<taille>.parquet`
+    associé au fichier source, ou agrège load_data() et écrit ce cache.
+    Évite de re-hasher le DataFrame complet à chaque rerun.
+    """
+    data_arg = data_path  # argument d'origine, pour partager le cache de load_data() des pages
+    if data_path is None:
+        data_path, _ = get_project_paths()
+
+    agg_path = data_path.with_name(REGION_AGG_FILENAME)
+    if (
+        agg_path.exists()
+        and (not data_path.exists() or agg_path.stat().st_mtime >= data_path.stat().st_mtime)
+        and _is_current_region_metrics(agg_path)
+    ):
+        try:
+            return pd.read_parquet(agg_path)
+        except (pa.ArrowInvalid, OSError):
+            pass  # agrégat illisible : on retombe sur le cache disque / le recalcul
+
+    # Cache disque entre sessions, clé = (version du calcul, mtime, taille du fichier source)
+    source_path = data_path if data_path.exists() else data_path.with_suffix(".parquet")
+    cache_path = None
+    if source_path.exists():
+        stat = source_path.stat()
+        cache_path = data_path.parent / (
+            f".region_metrics.v{REGION_METRICS_VERSION}.{stat.st_mtime_ns}-{stat.st_size}.parquet"
+        )
+        if cache_path.exists():
+            try:
+                return pd.read_parquet(cache_path)
+            except (pa.ArrowInvalid, OSError):
+                pass  # cache illisible : recalculé et réécrit ci-dessous
+
+    g = build_region_metrics(_load_data_shared(data_arg))
+
+    if cache_path is not None:
+        try:
+            save_region_metrics(g, cache_path)
+            # Anciens caches supprimés seulement une fois le nouveau écrit
+            for stale in data_path.parent.glob(".region_metrics.*.parquet"):
+                if stale != cache_path:
+                    stale.unlink()
+        except OSError:
+            pass  # dossier en lecture seule : recalcul au prochain démarrage
     return g
 
 
@@ -200,16 +513,16 @@ def compute_matching_diagnostics(g_y: pd.DataFrame, geojson_norm: dict) -> dict:
     """
     Donne des infos pour vérifier si le merge CSV ↔ GeoJSON match bien.
     """
-    geo_regions = {
-        feat.get("properties", {}).get("region_norm", "")
-        for feat in geojson_norm.get("features", [])
-    }
-    geo_regions = {r for r in geo_regions if r}
+    # ~20 features : lecture directe des 'region_norm' posés par load_geojson, sans cache
+    geo_regions = pd.Index(
+        {(feat.get("properties") or {}).get("region_norm", "") for feat in geojson_norm.get("features", [])}
+        - {""}
+    )
 
-    data_regions = set(g_y["nom_region_norm"].dropna().unique())
+    data_regions = pd.Index(g_y["nom_region_norm"].dropna().unique())
 
-    missing_in_geo = sorted([r for r in data_regions if r not in geo_regions])
-    missing_in_data = sorted([r for r in geo_regions if r not in data_regions])
+    missing_in_geo = sorted(data_regions.difference(geo_regions).tolist())
+    missing_in_data = sorted(geo_regions.difference(data_regions).tolist())
 
     return {
         "n_regions_data": len(data_regions),